@@ -25,6 +25,17 @@ def main():
     contextual_parser.add_argument('--interactive', action='store_true', 
                         help='Run in interactive mode')
     
+    # Evaluation subparser
+    eval_parser = subparsers.add_parser('eval', help='Compare simple and contextual RAG on a question set')
+    eval_parser.add_argument('--pdf_path', type=str, required=True, 
+                        help='Path to PDF file or directory containing PDF files')
+    eval_parser.add_argument('--questions', type=str, required=True, 
+                        help='Question file (.json, .jsonl or one question per line)')
+    eval_parser.add_argument('--output_dir', type=str, default='eval_results', 
+                        help='Directory for the cached vector stores, result store and summary')
+    eval_parser.add_argument('--workers', type=int, default=4, 
+                        help='Number of concurrent answering / scoring calls')
+    
     args = parser.parse_args()
     
     if args.command == 'simple':
@@ -43,6 +54,11 @@ def main():
         os.environ['INTERACTIVE'] = str(args.interactive)
         contextual_rag_main()
     
+    elif args.command == 'eval':
+        # Imported here so the other subcommands don't load RAGAS
+        from evaluation.cli import main as evaluation_main
+        evaluation_main(args)
+    
     else:
         parser.print_help()
 
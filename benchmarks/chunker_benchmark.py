@@ -0,0 +1,110 @@
+import argparse
+import time
+import tracemalloc
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from common.chunker import OffsetChunker
+from config import CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, TOKENIZER_ENCODING
+
+
+def run_recursive(documents):
+    """Split with the character-based splitter used by default"""
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP
+    )
+    return [doc.page_content for doc in splitter.split_documents(documents)]
+
+
+def run_offset(documents, chunker):
+    """Split with the offset chunker, keeping chunks as views"""
+    return chunker.split_documents(documents)
+
+
+def check_coverage(documents, chunk_size):
+    """Verify that offset chunks without overlap leave no non-whitespace text uncovered"""
+    chunker = OffsetChunker(chunk_size=chunk_size, chunk_overlap=0, encoding_name=TOKENIZER_ENCODING)
+    chunks = chunker.split_documents(documents)
+    if not chunks:
+        return True
+
+    text = chunks[0].buffer.text
+    covered_until = 0
+    for chunk in chunks:
+        gap = text[covered_until:chunk.start]
+        if gap.strip():
+            print(f"Coverage check failed: {gap!r} at offset {covered_until} is not in any chunk")
+            return False
+        covered_until = max(covered_until, chunk.end)
+    if text[covered_until:].strip():
+        print(f"Coverage check failed: text after offset {covered_until} is not in any chunk")
+        return False
+    return True
+
+
+def measure(name, split_fn, documents, repeat):
+    """Time a splitter and record its peak allocations"""
+    input_chars = sum(len(doc.page_content) for doc in documents)
+
+    # Warm up (e.g. tiktoken loads its encoding lazily)
+    split_fn(documents)
+
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        chunks = split_fn(documents)
+    elapsed = (time.perf_counter() - start_time) / repeat
+
+    tracemalloc.start()
+    chunks = split_fn(documents)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "name": name,
+        "chunks": chunks,
+        "seconds": elapsed,
+        "mb_per_second": input_chars / 1e6 / elapsed if elapsed else float("inf"),
+        "peak_mb": peak / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the recursive splitter against the offset chunker')
+    parser.add_argument('--pdf_path', type=str, default='data/mirage.pdf',
+                        help='PDF file to split')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of timed runs per splitter')
+    parser.add_argument('--scale', type=int, default=1,
+                        help='Repeat the PDF pages this many times to simulate a larger corpus')
+
+    args = parser.parse_args()
+
+    documents = PyPDFLoader(args.pdf_path).load() * args.scale
+    chunker = OffsetChunker(
+        chunk_size=CHUNK_TOKENS,
+        chunk_overlap=CHUNK_OVERLAP_TOKENS,
+        encoding_name=TOKENIZER_ENCODING
+    )
+    print(f"Loaded {len(documents)} pages ({sum(len(d.page_content) for d in documents)} characters)")
+
+    if check_coverage(documents, CHUNK_TOKENS):
+        print("Coverage check passed: offset chunks with no overlap cover all text")
+
+    results = [
+        measure("recursive", run_recursive, documents, args.repeat),
+        measure("offset", lambda docs: run_offset(docs, chunker), documents, args.repeat),
+    ]
+
+    print(f"\n{'splitter':<10} {'chunks':>7} {'ms/run':>9} {'MB/s':>8} {'peak MB':>8} {'max tokens':>11}")
+    for result in results:
+        chunks = result["chunks"]
+        if result["name"] == "offset":
+            max_tokens = max((chunk.num_tokens for chunk in chunks), default=0)
+        else:
+            max_tokens = max((chunker.count_tokens(text) for text in chunks), default=0)
+        print(f"{result['name']:<10} {len(chunks):>7} {result['seconds'] * 1000:>9.1f} "
+              f"{result['mb_per_second']:>8.2f} {result['peak_mb']:>8.2f} {max_tokens:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import bisect
+import re
+from array import array
+from typing import Any, Dict, Iterator, List, Optional
+from langchain_core.documents import Document
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken is listed in requirements.txt
+    tiktoken = None
+
+PAGE_SEPARATOR = "\n\n"
+DEFAULT_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+# Rough word/punctuation split used when tiktoken is not installed
+_FALLBACK_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+class DocumentBuffer:
+    """All pages of one source concatenated into a single string, with page offsets"""
+
+    __slots__ = ("text", "source", "metadata", "page_starts", "page_numbers")
+
+    def __init__(self, text: str, source: str, page_starts: List[int],
+                 page_numbers: List[int], metadata: Optional[Dict[str, Any]] = None):
+        self.text = text
+        self.source = source
+        self.page_starts = page_starts
+        self.page_numbers = page_numbers
+        self.metadata = metadata or {}
+
+    @classmethod
+    def from_documents(cls, documents: List[Document], source: Optional[str] = None) -> "DocumentBuffer":
+        """Build a buffer from the per-page documents returned by a loader"""
+        page_starts = []
+        page_numbers = []
+        offset = 0
+        for i, doc in enumerate(documents):
+            page_starts.append(offset)
+            page_numbers.append(doc.metadata.get("page", i))
+            offset += len(doc.page_content) + len(PAGE_SEPARATOR)
+
+        metadata = dict(documents[0].metadata) if documents else {}
+        metadata.pop("page", None)
+        metadata.pop("page_label", None)
+        if source is None:
+            source = metadata.get("source", "")
+        metadata["source"] = source
+
+        text = PAGE_SEPARATOR.join(doc.page_content for doc in documents)
+        return cls(text, source, page_starts, page_numbers, metadata)
+
+    def page_at(self, offset: int) -> int:
+        """Return the page number containing a character offset"""
+        if not self.page_starts:
+            return 0
+        index = bisect.bisect_right(self.page_starts, offset) - 1
+        return self.page_numbers[max(index, 0)]
+
+
+class ChunkView:
+    """A chunk of a DocumentBuffer, stored as (start, end) character offsets.
+
+    The chunk text is only sliced out of the buffer when ``text`` or
+    ``to_document`` is called, i.e. when it is about to be sent to an API.
+    """
+
+    __slots__ = ("buffer", "start", "end", "num_tokens")
+
+    def __init__(self, buffer: DocumentBuffer, start: int, end: int, num_tokens: int):
+        self.buffer = buffer
+        self.start = start
+        self.end = end
+        self.num_tokens = num_tokens
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __repr__(self) -> str:
+        return f"ChunkView(start={self.start}, end={self.end}, num_tokens={self.num_tokens})"
+
+    @property
+    def text(self) -> str:
+        """Materialize the chunk text"""
+        return self.buffer.text[self.start:self.end]
+
+    @property
+    def first_page(self) -> int:
+        return self.buffer.page_at(self.start)
+
+    @property
+    def last_page(self) -> int:
+        return self.buffer.page_at(max(self.start, self.end - 1))
+
+    def to_document(self) -> Document:
+        """Materialize the chunk as a LangChain document"""
+        return Document(
+            page_content=self.text,
+            metadata={
+                **self.buffer.metadata,
+                "page": self.first_page,
+                "page_end": self.last_page,
+                "start_index": self.start,
+                "end_index": self.end,
+                "num_tokens": self.num_tokens,
+            }
+        )
+
+
+class OffsetChunker:
+    """Token-aware chunker that emits offset-based chunk views over a whole document.
+
+    Chunks hold at most ``chunk_size`` tokens and consecutive chunks share about
+    ``chunk_overlap`` tokens. Chunk ends are moved back to the nearest paragraph,
+    line, sentence or word boundary when one exists in the second half of the chunk.
+    """
+
+    def __init__(self, chunk_size: int = 256, chunk_overlap: int = 50,
+                 encoding_name: str = "cl100k_base", separators=DEFAULT_SEPARATORS):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators
+        self.encoding = tiktoken.get_encoding(encoding_name) if tiktoken else None
+
+    def token_offsets(self, text: str) -> array:
+        """Return the character offset at which each token of the text starts"""
+        if self.encoding is None:
+            return array("q", (match.start() for match in _FALLBACK_TOKEN_PATTERN.finditer(text)))
+
+        tokens = self.encoding.encode_ordinary(text)
+        _, offsets = self.encoding.decode_with_offsets(tokens)
+        return array("q", offsets)
+
+    def count_tokens(self, text: str) -> int:
+        """Count the tokens in a piece of text"""
+        return len(self.token_offsets(text))
+
+    def _snap_end(self, text: str, start: int, end: int) -> int:
+        """Move a chunk end back to the start of a separator in the second half of the chunk.
+
+        Ending before the separator keeps the boundary on a token start, since
+        tokenizers like tiktoken attach leading whitespace to the following word.
+        """
+        lower = start + (end - start) // 2 + 1
+        for separator in self.separators:
+            pos = text.rfind(separator, lower, end)
+            if pos != -1:
+                return pos
+        return end
+
+    def iter_chunks(self, buffer: DocumentBuffer) -> Iterator[ChunkView]:
+        """Yield chunk views over a document buffer"""
+        text = buffer.text
+        offsets = self.token_offsets(text)
+        num_tokens = len(offsets)
+
+        start_token = 0
+        while start_token < num_tokens:
+            end_token = min(start_token + self.chunk_size, num_tokens)
+            start = offsets[start_token]
+
+            if end_token < num_tokens:
+                end = offsets[end_token]
+                snapped = self._snap_end(text, start, end)
+                # The token containing the snapped end (or starting exactly at it) is
+                # where the next chunk may start, so no text falls between chunks
+                boundary = bisect.bisect_right(offsets, snapped, start_token) - 1
+                if boundary > start_token:
+                    end, end_token = snapped, boundary
+            else:
+                end = len(text)
+
+            # Trim surrounding whitespace by moving the offsets, not by copying
+            chunk_start, chunk_end = start, end
+            while chunk_start < chunk_end and text[chunk_start].isspace():
+                chunk_start += 1
+            while chunk_end > chunk_start and text[chunk_end - 1].isspace():
+                chunk_end -= 1
+            if chunk_end > chunk_start:
+                yield ChunkView(buffer, chunk_start, chunk_end, end_token - start_token)
+
+            if end_token >= num_tokens:
+                break
+            start_token = max(end_token - self.chunk_overlap, start_token + 1)
+
+    def split_buffer(self, buffer: DocumentBuffer) -> List[ChunkView]:
+        """Split a document buffer into chunk views"""
+        return list(self.iter_chunks(buffer))
+
+    def split_documents(self, documents: List[Document], source: Optional[str] = None) -> List[ChunkView]:
+        """Concatenate the pages of one source and split them into chunk views"""
+        return self.split_buffer(DocumentBuffer.from_documents(documents, source=source))
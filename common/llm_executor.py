@@ -0,0 +1,392 @@
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, Dict, Optional
+from config import (
+    LLM_QUERY_DEADLINE, LLM_INGEST_DEADLINE, LLM_MAX_RETRIES, LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_MIN_SAMPLES, LLM_RETRY_BUDGET_RATIO, LLM_CIRCUIT_FAILURE_THRESHOLD,
+    LLM_CIRCUIT_RESET_SECONDS
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when an LLM call does not complete before its deadline"""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when the circuit breaker rejects a call without attempting it"""
+
+
+def percentile(values, pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    """Whether an error is an HTTP 429 / rate-limit response"""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or type(error).__name__ == "TooManyRequestsError" or "429" in str(error)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds to wait from a Retry-After header on the error, if there is one"""
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryBudget:
+    """Caps retries to a fraction of the request rate, so retries cannot amplify an outage.
+
+    Every request deposits ``ratio`` tokens (up to ``max_tokens``) and every retry
+    withdraws one. Starting with ``min_tokens`` lets a quiet executor still retry.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_tokens: float = 10.0, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets a single trial call through after a cool-down"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call should not be attempted"""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError("LLM circuit breaker is open")
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._trial_in_flight:
+                    raise CircuitOpenError("LLM circuit breaker is half-open and a trial call is in flight")
+                self._trial_in_flight = True
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets a trial call through"""
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def release(self):
+        """End a call that neither succeeded nor failed (e.g. rate limited) without tripping"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class LLMExecutor:
+    """Runs LLM calls with a deadline, hedged duplicates, budgeted jittered retries and a circuit breaker.
+
+    Each attempt runs on its own daemon thread. If it has not finished once the observed
+    ``hedge_percentile`` latency has passed, a duplicate request is sent and whichever
+    finishes first wins. Calls that are still running past their deadline are
+    abandoned and DeadlineExceeded is raised; since their threads are daemonic, a
+    stalled request does not keep the process alive at exit.
+    """
+
+    def __init__(self, name: str, deadline: float = 30.0, max_retries: int = 2,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 hedge_percentile: Optional[float] = 95, hedge_min_samples: int = 20,
+                 retry_budget: Optional[RetryBudget] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 rate_limit_backoff: float = 15.0, wait_for_circuit: bool = False,
+                 latency_window: int = 1000):
+        self.name = name
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.retry_budget = retry_budget or RetryBudget()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        # Rate-limited calls wait at least this long and do not count as breaker failures
+        self.rate_limit_backoff = rate_limit_backoff
+        # Wait for an open breaker to half-open (within the deadline) instead of failing fast
+        self.wait_for_circuit = wait_for_circuit
+
+        self._lock = threading.Lock()
+        self._attempt_latencies = deque(maxlen=latency_window)
+        # End-to-end latency of every call, however it ended, and of successful calls only
+        self._call_latencies = deque(maxlen=latency_window)
+        self._success_latencies = deque(maxlen=latency_window)
+        self._counters = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "rejected": 0,
+            "retries": 0,
+            "retries_denied": 0,
+            "rate_limited": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+        }
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Latency after which a duplicate request is sent, or None if hedging is off"""
+        if self.hedge_percentile is None:
+            return None
+        with self._lock:
+            if len(self._attempt_latencies) < self.hedge_min_samples:
+                return None
+            return percentile(self._attempt_latencies, self.hedge_percentile)
+
+    def _submit(self, fn: Callable, args, kwargs) -> Future:
+        """Run ``fn`` on a daemon thread and return a future for its result"""
+        future = Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name=f"llm-{self.name}", daemon=True).start()
+        return future
+
+    def _attempt(self, fn: Callable, args, kwargs, deadline_at: float):
+        """Run one attempt, hedging it if it is slower than usual"""
+        start_time = time.monotonic()
+        primary = self._submit(fn, args, kwargs)
+        submitted_at = {primary: start_time}
+        pending = {primary}
+        hedge_delay = self._hedge_delay()
+        hedged = False
+        last_error = None
+
+        while pending:
+            now = time.monotonic()
+            remaining = deadline_at - now
+            if remaining <= 0:
+                raise DeadlineExceeded("LLM call exceeded its deadline")
+
+            timeout = remaining
+            if not hedged and hedge_delay is not None:
+                timeout = min(timeout, max(0.0, start_time + hedge_delay - now))
+
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    # Measured from this request's own submit time, so hedge wins
+                    # don't inflate the latency distribution by the hedge delay
+                    with self._lock:
+                        self._attempt_latencies.append(time.monotonic() - submitted_at[future])
+                    if future is not primary:
+                        self._count("hedge_wins")
+                    return future.result()
+                last_error = error
+
+            if not hedged and hedge_delay is not None and pending \
+                    and time.monotonic() - start_time >= hedge_delay:
+                hedge = self._submit(fn, args, kwargs)
+                submitted_at[hedge] = time.monotonic()
+                pending.add(hedge)
+                hedged = True
+                self._count("hedges")
+
+        raise last_error
+
+    def call(self, fn: Callable, *args, deadline: Optional[float] = None,
+             max_retries: Optional[int] = None, **kwargs) -> Any:
+        """Call ``fn(*args, **kwargs)`` under the executor's policies and return its result"""
+        deadline = self.deadline if deadline is None else deadline
+        max_retries = self.max_retries if max_retries is None else max_retries
+        start_time = time.monotonic()
+        deadline_at = start_time + deadline
+
+        self._count("calls")
+        self.retry_budget.deposit()
+
+        succeeded = False
+        try:
+            result = self._call(fn, args, kwargs, deadline, max_retries, deadline_at)
+            succeeded = True
+            return result
+        finally:
+            latency = time.monotonic() - start_time
+            with self._lock:
+                self._call_latencies.append(latency)
+                if succeeded:
+                    self._success_latencies.append(latency)
+
+    def _call(self, fn: Callable, args: tuple, kwargs: dict, deadline: float,
+              max_retries: int, deadline_at: float) -> Any:
+        """Retry loop of ``call``"""
+        attempt = 0
+        while True:
+            try:
+                self.circuit_breaker.before_call()
+            except CircuitOpenError:
+                wait_time = self.circuit_breaker.retry_in()
+                if self.wait_for_circuit and time.monotonic() + wait_time < deadline_at:
+                    print(f"LLM circuit breaker is open. Waiting {wait_time:.2f} seconds before retrying...")
+                    time.sleep(wait_time if wait_time > 0 else 0.1)
+                    continue
+                self._count("rejected")
+                raise
+
+            try:
+                result = self._attempt(fn, args, kwargs, deadline_at)
+            except DeadlineExceeded:
+                self.circuit_breaker.record_failure()
+                self._count("timeouts")
+                raise
+            except Exception as e:
+                rate_limited = _is_rate_limited(e)
+                if rate_limited:
+                    # The service is healthy but asking us to slow down
+                    self.circuit_breaker.release()
+                    self._count("rate_limited")
+                else:
+                    self.circuit_breaker.record_failure()
+                    if self.circuit_breaker.state == "open" and not self.wait_for_circuit:
+                        # This failure opened the breaker, so a retry would only be rejected
+                        self._count("failures")
+                        raise
+                attempt += 1
+                if attempt > max_retries:
+                    self._count("failures")
+                    raise
+                if not rate_limited and not self.retry_budget.withdraw():
+                    self._count("retries_denied")
+                    self._count("failures")
+                    raise
+
+                if rate_limited:
+                    # Honour Retry-After, otherwise back off from rate_limit_backoff (15, 30, 60s...)
+                    delay = _retry_after(e)
+                    if delay is None:
+                        delay = self.rate_limit_backoff * 2 ** (attempt - 1) * random.uniform(1.0, 1.25)
+                else:
+                    # Full jitter exponential backoff
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+                if time.monotonic() + delay >= deadline_at:
+                    self._count("timeouts")
+                    raise DeadlineExceeded(f"LLM call exceeded its deadline of {deadline:.1f}s") from e
+                print(f"LLM call failed ({str(e)}). Retrying in {delay:.2f} seconds... (Attempt {attempt}/{max_retries})")
+                self._count("retries")
+                time.sleep(delay)
+                continue
+
+            self.circuit_breaker.record_success()
+            self._count("successes")
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and tail-latency statistics (in seconds) for this executor"""
+        with self._lock:
+            latencies = list(self._call_latencies)
+            success_latencies = list(self._success_latencies)
+            stats = dict(self._counters)
+        stats.update({
+            "name": self.name,
+            "circuit_state": self.circuit_breaker.state,
+            "hedge_delay_s": self._hedge_delay(),
+            "latency_p50_s": percentile(latencies, 50),
+            "latency_p95_s": percentile(latencies, 95),
+            "latency_p99_s": percentile(latencies, 99),
+            "latency_max_s": max(latencies) if latencies else None,
+            "success_latency_p50_s": percentile(success_latencies, 50),
+            "success_latency_p95_s": percentile(success_latencies, 95),
+            "success_latency_p99_s": percentile(success_latencies, 99),
+        })
+        return stats
+
+
+_executors: Dict[str, LLMExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name: str) -> LLMExecutor:
+    """Return the shared executor for a call path ("query" or "ingest")"""
+    with _executors_lock:
+        if name not in _executors:
+            if name == "ingest":
+                # Context generation is rate limited, so hedging would only burn quota
+                _executors[name] = LLMExecutor(
+                    name,
+                    deadline=LLM_INGEST_DEADLINE,
+                    max_retries=3,
+                    backoff_base=5.0,
+                    backoff_max=60.0,
+                    hedge_percentile=None,
+                    rate_limit_backoff=15.0,
+                    wait_for_circuit=True,
+                    retry_budget=RetryBudget(ratio=LLM_RETRY_BUDGET_RATIO),
+                    circuit_breaker=CircuitBreaker(LLM_CIRCUIT_FAILURE_THRESHOLD, LLM_CIRCUIT_RESET_SECONDS)
+                )
+            else:
+                _executors[name] = LLMExecutor(
+                    name,
+                    deadline=LLM_QUERY_DEADLINE,
+                    max_retries=LLM_MAX_RETRIES,
+                    hedge_percentile=LLM_HEDGE_PERCENTILE,
+                    hedge_min_samples=LLM_HEDGE_MIN_SAMPLES,
+                    retry_budget=RetryBudget(ratio=LLM_RETRY_BUDGET_RATIO),
+                    circuit_breaker=CircuitBreaker(LLM_CIRCUIT_FAILURE_THRESHOLD, LLM_CIRCUIT_RESET_SECONDS)
+                )
+        return _executors[name]
+
+
+def get_all_stats() -> Dict[str, Dict[str, Any]]:
+    """Statistics for every executor created so far"""
+    with _executors_lock:
+        executors = list(_executors.values())
+    return {executor.name: executor.stats() for executor in executors}
@@ -0,0 +1,392 @@
+import hashlib
+import heapq
+import json
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import chromadb
+from chromadb.api.shared_system_client import SharedSystemClient
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+REGISTRY_FILE = "shards.json"
+
+
+def _check_chroma_internals():
+    """Fail fast if chromadb no longer exposes what unloading a shard relies on.
+
+    chromadb caches one System (SQLite connection, HNSW segments) per persist path
+    in ``SharedSystemClient._identifier_to_system`` and only offers a public way to
+    stop all of them at once. Unloading a single shard therefore pops its entry
+    directly, which is tied to the chromadb version pinned in requirements.txt (0.6.3).
+    """
+    if not isinstance(getattr(SharedSystemClient, "_identifier_to_system", None), dict) \
+            or not hasattr(SharedSystemClient, "_get_identifier_from_settings"):
+        raise RuntimeError(
+            f"chromadb {chromadb.__version__} does not expose the client cache needed to release "
+            "persisted shards; install the version pinned in requirements.txt"
+        )
+
+
+class ShardedRetriever(BaseRetriever):
+    """Retriever that fans a query out over a ShardedVectorStore"""
+
+    store: Any
+    k: int = 3
+    sources: Optional[List[str]] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        """Get relevant documents for a query from the routed shards"""
+        return self.store.similarity_search(query, k=self.k, sources=self.sources)
+
+
+class ShardedVectorStore:
+    """Vector store that splits documents across independent Chroma collections.
+
+    Documents are assigned to a shard either per source file (``shard_by="source"``)
+    or by hashing the source into ``num_shards`` buckets (``shard_by="hash"``).
+    Each shard is its own collection, and its own directory when persisted, so a
+    single source can be dropped or rebuilt without touching the rest of the corpus.
+    Queries are embedded once, searched against the shards in parallel and the
+    per-shard top-k lists are merged with a heap.
+    """
+
+    def __init__(self, embeddings, persist_directory=None, namespace: str = "rag",
+                 shard_by: str = "source", num_shards: int = 8,
+                 max_loaded_shards: Optional[int] = None, max_workers: int = 4):
+        if shard_by not in ("source", "hash"):
+            raise ValueError(f"Unknown shard_by value: {shard_by!r} (expected 'source' or 'hash')")
+
+        self.embeddings = embeddings
+        self.persist_directory = persist_directory
+        self.namespace = namespace
+        self.shard_by = shard_by
+        self.num_shards = num_shards
+        self.max_workers = max_workers
+
+        # Unloading an in-memory shard would throw its contents away, so the
+        # loaded-shard cap only applies when shards are persisted to disk
+        self.max_loaded_shards = max_loaded_shards if persist_directory else None
+
+        self._lock = threading.RLock()
+        self._loaded: "OrderedDict[str, Chroma]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._loading: Dict[str, threading.Event] = {}
+        self._shard_sources: Dict[str, List[str]] = {}
+        self._clients: Dict[str, Any] = {}
+
+        if persist_directory:
+            _check_chroma_internals()
+            os.makedirs(persist_directory, exist_ok=True)
+            self._load_registry()
+
+    # ------------------------------------------------------------------
+    # Shard naming and registry
+    # ------------------------------------------------------------------
+
+    def shard_for_source(self, source: str) -> str:
+        """Return the shard (collection) name a source is stored in"""
+        digest = hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+        if self.shard_by == "hash":
+            return f"{self.namespace}-hash-{int(digest, 16) % self.num_shards:03d}"
+
+        stem = os.path.splitext(os.path.basename(source))[0]
+        slug = re.sub(r"[^a-zA-Z0-9]+", "-", stem).strip("-")[:30] or "doc"
+        return f"{self.namespace}-{slug}-{digest[:8]}"
+
+    @property
+    def shard_names(self) -> List[str]:
+        """Names of all known shards"""
+        with self._lock:
+            return sorted(self._shard_sources)
+
+    def has_source(self, source: str) -> bool:
+        """Whether any chunks of a source are stored"""
+        with self._lock:
+            return source in self._shard_sources.get(self.shard_for_source(source), [])
+
+    @property
+    def loaded_shards(self) -> List[str]:
+        """Names of the shards currently held in memory"""
+        with self._lock:
+            return list(self._loaded)
+
+    def _registry_path(self) -> str:
+        return os.path.join(self.persist_directory, REGISTRY_FILE)
+
+    def _load_registry(self):
+        """Read the shard -> sources mapping written by a previous run"""
+        path = self._registry_path()
+        if not os.path.exists(path):
+            return
+
+        with open(path, "r", encoding="utf-8") as f:
+            registry = json.load(f)
+
+        if (registry.get("shard_by") != self.shard_by or registry.get("namespace") != self.namespace
+                or (self.shard_by == "hash" and registry.get("num_shards") != self.num_shards)):
+            # Sources would map to different shards now, so the old shards could only
+            # be searched as duplicates of the re-ingested chunks. Drop them.
+            print(f"Discarding shard registry at {path}: it was written with different sharding settings")
+            for name in registry.get("shards", {}):
+                shutil.rmtree(os.path.join(self.persist_directory, name), ignore_errors=True)
+            os.remove(path)
+            return
+
+        self._shard_sources = {name: list(sources) for name, sources in registry.get("shards", {}).items()}
+
+    def _save_registry(self):
+        """Persist the shard -> sources mapping"""
+        if not self.persist_directory:
+            return
+
+        registry = {
+            "namespace": self.namespace,
+            "shard_by": self.shard_by,
+            "num_shards": self.num_shards,
+            "shards": self._shard_sources,
+        }
+        tmp_path = self._registry_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(registry, f, indent=2)
+        os.replace(tmp_path, self._registry_path())
+
+    # ------------------------------------------------------------------
+    # Loading and unloading
+    # ------------------------------------------------------------------
+
+    def _open_shard(self, name: str) -> Chroma:
+        """Create the Chroma handle backing a shard"""
+        if not self.persist_directory:
+            return Chroma(collection_name=name, embedding_function=self.embeddings)
+
+        # Each persisted shard gets its own client so it can be released on its own
+        client = chromadb.PersistentClient(path=os.path.join(self.persist_directory, name))
+        with self._lock:
+            self._clients[name] = client
+        return Chroma(
+            collection_name=name,
+            embedding_function=self.embeddings,
+            client=client
+        )
+
+    def _pin(self, name: str, shard: Chroma) -> Chroma:
+        """Mark a loaded shard as most recently used and in use. Caller holds the lock."""
+        self._loaded.move_to_end(name)
+        self._pins[name] = self._pins.get(name, 0) + 1
+        self._evict()
+        return shard
+
+    def _acquire(self, name: str) -> Chroma:
+        """Load a shard if needed and pin it so it is not evicted while in use"""
+        while True:
+            with self._lock:
+                shard = self._loaded.get(name)
+                if shard is not None:
+                    return self._pin(name, shard)
+                loading = self._loading.get(name)
+                if loading is None:
+                    # This thread loads the shard; others asking for it wait on the event
+                    loading = self._loading[name] = threading.Event()
+                    break
+            loading.wait()
+
+        # Open the Chroma client outside the store lock so other shards load in parallel
+        try:
+            shard = self._open_shard(name)
+        except Exception:
+            with self._lock:
+                del self._loading[name]
+                self._close(name)
+            loading.set()
+            raise
+
+        with self._lock:
+            self._loaded[name] = shard
+            del self._loading[name]
+            self._pin(name, shard)
+        loading.set()
+        return shard
+
+    def _release(self, name: str):
+        """Unpin a shard acquired with _acquire"""
+        with self._lock:
+            self._pins[name] -= 1
+            if self._pins[name] <= 0:
+                del self._pins[name]
+            self._evict()
+
+    def _evict(self):
+        """Unload least recently used, unpinned shards above the loaded-shard cap"""
+        if self.max_loaded_shards is None:
+            return
+
+        for name in list(self._loaded):
+            if len(self._loaded) <= self.max_loaded_shards:
+                break
+            if name not in self._pins:
+                del self._loaded[name]
+                self._close(name)
+
+    def _close(self, name: str):
+        """Stop the chromadb system behind a persisted shard's client. Caller holds the lock."""
+        client = self._clients.pop(name, None)
+        if client is None:
+            return
+        identifier = SharedSystemClient._get_identifier_from_settings(client.get_settings())
+        system = SharedSystemClient._identifier_to_system.pop(identifier, None)
+        if system is not None:
+            system.stop()
+
+    def load_shard(self, name: str) -> Chroma:
+        """Load a shard into memory and return its Chroma handle"""
+        shard = self._acquire(name)
+        self._release(name)
+        return shard
+
+    def unload_shard(self, name: str) -> bool:
+        """Unload a persisted shard from memory. Returns False if it cannot be unloaded."""
+        with self._lock:
+            if name not in self._loaded:
+                return False
+            if not self.persist_directory:
+                print(f"Shard {name} is not persisted; keeping it loaded to avoid losing its contents")
+                return False
+            if name in self._pins:
+                print(f"Shard {name} is in use and cannot be unloaded right now")
+                return False
+            del self._loaded[name]
+            self._close(name)
+            return True
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def add_documents(self, documents: List[Document]) -> List[str]:
+        """Add documents to the shards their sources map to"""
+        grouped: Dict[str, List[Document]] = {}
+        for doc in documents:
+            source = doc.metadata.get("source", "")
+            name = self.shard_for_source(source)
+            grouped.setdefault(name, []).append(doc)
+            with self._lock:
+                sources = self._shard_sources.setdefault(name, [])
+                if source not in sources:
+                    sources.append(source)
+
+        ids = []
+        for name, docs in grouped.items():
+            shard = self._acquire(name)
+            try:
+                ids.extend(shard.add_documents(documents=docs))
+            finally:
+                self._release(name)
+
+        with self._lock:
+            self._save_registry()
+        return ids
+
+    def delete_source(self, source: str) -> None:
+        """Remove every chunk of a source, dropping its shard when it owns the whole shard"""
+        name = self.shard_for_source(source)
+        with self._lock:
+            sources = self._shard_sources.get(name)
+            registered = bool(sources) and source in sources
+            if registered:
+                sources.remove(source)
+            drop_shard = registered and not sources
+
+        if not registered:
+            # Chunks may still be on disk, e.g. when a run stopped between adding
+            # documents and saving the registry
+            if not self.persist_directory or not os.path.isdir(os.path.join(self.persist_directory, name)):
+                return
+            shard = self._acquire(name)
+            try:
+                shard.delete(where={"source": source})
+            finally:
+                self._release(name)
+            return
+
+        shard = self._acquire(name)
+        try:
+            if drop_shard:
+                shard.delete_collection()
+            else:
+                shard.delete(where={"source": source})
+        finally:
+            self._release(name)
+
+        with self._lock:
+            if drop_shard:
+                self._shard_sources.pop(name, None)
+                self._loaded.pop(name, None)
+                if self.persist_directory:
+                    self._close(name)
+                    shutil.rmtree(os.path.join(self.persist_directory, name), ignore_errors=True)
+            self._save_registry()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def _route(self, sources: Optional[Iterable[str]] = None) -> List[str]:
+        """Return the shards that can contain results for the given sources"""
+        with self._lock:
+            if sources is None:
+                return sorted(self._shard_sources)
+            names = {self.shard_for_source(source) for source in sources}
+            return sorted(name for name in names if name in self._shard_sources)
+
+    def _search_shard(self, name: str, embedding: List[float], k: int,
+                      where: Optional[Dict[str, Any]]) -> List[Tuple[Document, float]]:
+        shard = self._acquire(name)
+        try:
+            return shard.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=where)
+        finally:
+            self._release(name)
+
+    def similarity_search_with_score(self, query: str, k: int = 3, sources: Optional[List[str]] = None,
+                                     filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """Search the routed shards in parallel and merge their results (lower score is closer)"""
+        names = self._route(sources)
+        if not names:
+            return []
+
+        # Within a shard that holds several sources, restrict hits to the requested ones
+        where = filter
+        if sources is not None and self.shard_by == "hash":
+            source_filter = {"source": {"$in": list(sources)}}
+            where = {"$and": [filter, source_filter]} if filter else source_filter
+
+        # Embed the query once instead of once per shard
+        embedding = self.embeddings.embed_query(query)
+
+        # Keep at most max_loaded_shards shards in memory at a time
+        batch_size = self.max_loaded_shards or len(names)
+        results: List[Tuple[Document, float]] = []
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(names)))) as executor:
+            for start in range(0, len(names), batch_size):
+                batch = names[start:start + batch_size]
+                for hits in executor.map(lambda name: self._search_shard(name, embedding, k, where), batch):
+                    results.extend(hits)
+
+        return heapq.nsmallest(k, results, key=lambda hit: hit[1])
+
+    def similarity_search(self, query: str, k: int = 3, sources: Optional[List[str]] = None,
+                          filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """Perform similarity search across the routed shards"""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, sources=sources, filter=filter)]
+
+    def as_retriever(self, search_kwargs=None) -> ShardedRetriever:
+        """Return the sharded store as a retriever"""
+        if search_kwargs is None:
+            search_kwargs = {"k": 3}
+        return ShardedRetriever(store=self, k=search_kwargs.get("k", 3), sources=search_kwargs.get("sources"))
@@ -10,12 +10,36 @@ COHERE_API_KEY = os.getenv("COHERE_API_KEY")
 # Vector database settings
 PERSIST_DIRECTORY = "vector_db"
 
+# Sharding: "source" (one collection per PDF), "hash" (sources hashed into
+# NUM_SHARDS collections) or None (a single collection)
+SHARD_BY = "source"
+NUM_SHARDS = 8
+MAX_LOADED_SHARDS = None  # Only enforced for persisted shards
+SHARD_SEARCH_WORKERS = 4
+
 # Text chunking parameters
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
 
+# Chunker: "recursive" (character-based RecursiveCharacterTextSplitter) or
+# "offset" (token-aware OffsetChunker over the whole document)
+CHUNKER = "recursive"
+CHUNK_TOKENS = 256
+CHUNK_OVERLAP_TOKENS = 50
+TOKENIZER_ENCODING = "cl100k_base"
+
 # Default PDF directory
 DEFAULT_PDF_DIR = "data/mirage"
 
 # Retrieval parameters
-DEFAULT_RETRIEVAL_K = 3
\ No newline at end of file
+DEFAULT_RETRIEVAL_K = 3
+
+# LLM call policies (see common/llm_executor.py)
+LLM_QUERY_DEADLINE = 30.0  # seconds per query-path call, retries included
+LLM_INGEST_DEADLINE = 180.0  # seconds per context-generation call, retries included
+LLM_MAX_RETRIES = 2
+LLM_HEDGE_PERCENTILE = 95  # Send a duplicate request once this latency percentile has passed
+LLM_HEDGE_MIN_SAMPLES = 20  # Latency samples needed before hedging starts
+LLM_RETRY_BUDGET_RATIO = 0.2  # Retries allowed per request, on average
+LLM_CIRCUIT_FAILURE_THRESHOLD = 5
+LLM_CIRCUIT_RESET_SECONDS = 30.0
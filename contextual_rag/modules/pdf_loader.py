@@ -1,30 +1,56 @@
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from langchain_core.documents import Document
 import cohere
 import time
 import random
-from config import COHERE_API_KEY, CHUNK_SIZE, CHUNK_OVERLAP
+from common.chunker import ChunkView, OffsetChunker
+from common.llm_executor import get_executor
+from common.sharded_store import ShardedVectorStore
+from config import COHERE_API_KEY, CHUNK_SIZE, CHUNK_OVERLAP, CHUNKER, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, TOKENIZER_ENCODING, SHARD_BY, NUM_SHARDS, MAX_LOADED_SHARDS, SHARD_SEARCH_WORKERS
 
 class ContextualPDFProcessor:
-    def __init__(self, embeddings, llm, persist_directory=None):
+    def __init__(self, embeddings, llm, persist_directory=None, shard_by=SHARD_BY, chunker=CHUNKER, executor=None):
         """Initialize contextual PDF processor with text splitter and vector store"""
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP
-        )
-        self.vector_store = Chroma(
-            embedding_function=embeddings,
-            persist_directory=persist_directory
-        )
+        if chunker == "offset":
+            self.text_splitter = OffsetChunker(
+                chunk_size=CHUNK_TOKENS,
+                chunk_overlap=CHUNK_OVERLAP_TOKENS,
+                encoding_name=TOKENIZER_ENCODING
+            )
+        elif chunker == "recursive":
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=CHUNK_SIZE,
+                chunk_overlap=CHUNK_OVERLAP
+            )
+        else:
+            raise ValueError(f"Unknown chunker: {chunker!r} (expected 'recursive' or 'offset')")
+        if shard_by:
+            self.vector_store = ShardedVectorStore(
+                embeddings,
+                persist_directory=persist_directory,
+                namespace="contextual",
+                shard_by=shard_by,
+                num_shards=NUM_SHARDS,
+                max_loaded_shards=MAX_LOADED_SHARDS,
+                max_workers=SHARD_SEARCH_WORKERS
+            )
+        else:
+            self.vector_store = Chroma(
+                embedding_function=embeddings,
+                persist_directory=persist_directory
+            )
         # Store the LangChain LLM for compatibility but we won't use it directly
         self.llm = llm
         
         # Create a direct Cohere client
         self.co = cohere.Client(COHERE_API_KEY)
         
+        # Shared executor for ingest-path LLM calls
+        self.executor = executor or get_executor("ingest")
+        
         # Rate limiting properties
         self.last_api_call = 0
         self.min_time_between_calls = 6.0  # seconds (allow max 10 calls per minute)
@@ -43,120 +69,120 @@ class ContextualPDFProcessor:
         self.last_api_call = time.time()
     
     def generate_chunk_context(self, chunk_content: str, max_retries=3) -> str:
-        """Generate contextual summary for a chunk using direct Cohere API with retries"""
-        retries = 0
-        backoff_factor = 1
-        
-        while retries <= max_retries:
-            try:
-                # Wait for rate limit
-                self._wait_for_rate_limit()
+        """Generate contextual summary for a chunk using direct Cohere API with retries.
+
+        Raises if no context could be generated.
+        """
+        def request():
+            # Wait for rate limit
+            self._wait_for_rate_limit()
+            
+            # Call the Cohere API directly
+            return self.co.chat(
+                message=f"""
+                Provide a brief context for the following text chunk.
                 
-                # Call the Cohere API directly
-                response = self.co.chat(
-                    message=f"""
-                    Provide a brief context for the following text chunk.
-                    
-                    Provide 1-2 sentences that explain:
-                    1. What is the main topic of this chunk?
-                    2. What key information does it contain?
-                    
-                    Text chunk:
-                    {chunk_content}
-                    
-                    Provide ONLY the contextual summary in 1-2 sentences. Be concise but informative.
-                    """,
-                    model="command",
-                    temperature=0.0
-                )
+                Provide 1-2 sentences that explain:
+                1. What is the main topic of this chunk?
+                2. What key information does it contain?
                 
-                # Return the text response
-                return response.text
-                    
-            except Exception as e:
-                retries += 1
+                Text chunk:
+                {chunk_content}
                 
-                if "429" in str(e) and retries <= max_retries:
-                    # Rate limit hit, apply exponential backoff
-                    wait_time = backoff_factor * 15  # 15, 30, 60 seconds
-                    backoff_factor *= 2
-                    print(f"Rate limit hit. Retrying in {wait_time} seconds... (Attempt {retries}/{max_retries})")
-                    time.sleep(wait_time)
-                else:
-                    print(f"Error generating context with direct Cohere API: {str(e)}")
-                    if retries <= max_retries:
-                        wait_time = backoff_factor * 5
-                        print(f"Retrying in {wait_time} seconds... (Attempt {retries}/{max_retries})")
-                        time.sleep(wait_time)
-                        backoff_factor *= 2
-                    else:
-                        return "Context unavailable due to API error after multiple retries."
-        
-        return "Failed to generate context after multiple attempts."
+                Provide ONLY the contextual summary in 1-2 sentences. Be concise but informative.
+                """,
+                model="command",
+                temperature=0.0
+            )
+        
+        # Deadline, retries (with rate-limit backoff) and circuit breaking are handled by
+        # the shared executor; errors propagate so the chunk is not indexed with a fake context
+        response = self.executor.call(request, max_retries=max_retries)
+        return response.text
     
     def create_contextual_document(self, document: Document) -> Document:
-        """Enrich a document with contextual information"""
-        try:
-            # Generate context using just the chunk content
-            context = self.generate_chunk_context(document.page_content)
-            
-            # Create new document with context + original content
-            contextual_content = f"Context: {context}\n\nContent: {document.page_content}"
-            
-            # Create new document with same metadata but enriched content
-            return Document(
-                page_content=contextual_content,
-                metadata={
-                    **document.metadata,
-                    "original_content": document.page_content,
-                    "context_summary": context
-                }
-            )
-        except Exception as e:
-            print(f"Error creating contextual document: {str(e)}")
-            return document
+        """Enrich a document with contextual information. Raises if no context could be generated."""
+        # Generate context using just the chunk content
+        context = self.generate_chunk_context(document.page_content)
+        
+        # Create new document with context + original content
+        contextual_content = f"Context: {context}\n\nContent: {document.page_content}"
+        
+        # Create new document with same metadata but enriched content
+        return Document(
+            page_content=contextual_content,
+            metadata={
+                **document.metadata,
+                "original_content": document.page_content,
+                "context_summary": context
+            }
+        )
+    
+    def split_pdf(self, pdf_path: str) -> list:
+        """Load a PDF and split it into chunks (documents or offset chunk views)"""
+        # Load PDF
+        loader = PyPDFLoader(pdf_path)
+        documents = loader.load()
+        
+        # Add source metadata
+        for doc in documents:
+            if "source" not in doc.metadata:
+                doc.metadata["source"] = pdf_path
+        
+        # Split text; offset chunks stay as views until they are sent to the API
+        if isinstance(self.text_splitter, OffsetChunker):
+            return self.text_splitter.split_documents(documents, source=pdf_path)
+        return self.text_splitter.split_documents(documents)
+    
+    def index_splits(self, splits: list, pdf_path: str) -> Tuple[List[Document], int]:
+        """Enrich the chunks of a PDF with context and add them to the vector store.
+
+        Returns the indexed documents and the number of chunks that could not be
+        enriched (those are indexed with their original content only).
+        """
+        print(f"Document split into {len(splits)} chunks.")
+        
+        # Option to process only a subset of chunks while testing
+        max_chunks = 95  # Set to None to process all chunks
+        if max_chunks and len(splits) > max_chunks:
+            print(f"Limiting processing to first {max_chunks} chunks for testing.")
+            splits = splits[:max_chunks]
+        
+        # Enrich each chunk with context
+        contextual_documents = []
+        failed = 0
+        print(f"Generating contextual embeddings for {len(splits)} chunks...")
+        
+        for i, chunk in enumerate(splits):
+            try:
+                print(f"Processing chunk {i+1}/{len(splits)}")
+                if isinstance(chunk, ChunkView):
+                    chunk = chunk.to_document()
+                contextual_doc = self.create_contextual_document(chunk)
+                contextual_documents.append(contextual_doc)
+            except Exception as e:
+                print(f"Error processing chunk {i+1}: {str(e)}")
+                contextual_documents.append(chunk)
+                failed += 1
+        
+        if failed:
+            print(f"Warning: {failed}/{len(splits)} chunks were indexed without context.")
+        
+        # Drop any chunks from a previous ingest of this PDF so it is rebuilt in place
+        if isinstance(self.vector_store, ShardedVectorStore):
+            self.vector_store.delete_source(pdf_path)
+        
+        # Add to vector store
+        if contextual_documents:
+            self.vector_store.add_documents(documents=contextual_documents)
+        
+        return contextual_documents, failed
     
     def load_and_process(self, pdf_path: str) -> List[Document]:
         """Load and process a PDF document with contextual enrichment"""
         try:
-            # Load PDF
-            loader = PyPDFLoader(pdf_path)
-            documents = loader.load()
-            
-            # Add source metadata
-            for doc in documents:
-                if "source" not in doc.metadata:
-                    doc.metadata["source"] = pdf_path
-            
-            # Split text
-            splits = self.text_splitter.split_documents(documents)
-            print(f"Document split into {len(splits)} chunks.")
-            
-            # Option to process only a subset of chunks while testing
-            max_chunks = 95  # Set to None to process all chunks
-            if max_chunks and len(splits) > max_chunks:
-                print(f"Limiting processing to first {max_chunks} chunks for testing.")
-                splits = splits[:max_chunks]
-            
-            # Enrich each chunk with context
-            contextual_documents = []
-            print(f"Generating contextual embeddings for {len(splits)} chunks...")
-            
-            for i, chunk in enumerate(splits):
-                try:
-                    print(f"Processing chunk {i+1}/{len(splits)}")
-                    contextual_doc = self.create_contextual_document(chunk)
-                    contextual_documents.append(contextual_doc)
-                except Exception as e:
-                    print(f"Error processing chunk {i+1}: {str(e)}")
-                    contextual_documents.append(chunk)
-            
-            # Add to vector store
-            if contextual_documents:
-                self.vector_store.add_documents(documents=contextual_documents)
-            
-            return contextual_documents
-            
+            documents, _ = self.index_splits(self.split_pdf(pdf_path), pdf_path)
+            return documents
         except Exception as e:
             print(f"Error processing PDF {pdf_path}: {str(e)}")
-            return []
\ No newline at end of file
+            return []
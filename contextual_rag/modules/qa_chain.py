@@ -2,14 +2,16 @@ from langchain_chroma import Chroma
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from common.llm_executor import get_executor
 
 class ContextualQAChain:
     """Question-answering chain for Contextual RAG"""
     
-    def __init__(self, vector_store: Chroma, llm):
+    def __init__(self, vector_store: Chroma, llm, executor=None):
         self.vector_store = vector_store
         self.llm = llm
+        self.executor = executor or get_executor("query")
         self.retriever = vector_store.as_retriever(search_kwargs={"k": 3})
         
         # Query reformulation prompt
@@ -69,7 +71,7 @@ class ContextualQAChain:
         )
         
         try:
-            return reformulation_chain.invoke({
+            return self.executor.call(reformulation_chain.invoke, {
                 "history": formatted_history,
                 "question": query
             })
@@ -77,8 +79,8 @@ class ContextualQAChain:
             print(f"Error in query reformulation: {e}")
             return query
     
-    def _get_context(self, query: str, history: Optional[List[Dict[str, str]]] = None) -> str:
-        """Get context for query"""
+    def _get_contexts(self, query: str, history: Optional[List[Dict[str, str]]] = None) -> List[str]:
+        """Get the retrieved context passages for query"""
         reformulated_query = self.reformulate_query(query, history)
         docs = self.retriever.get_relevant_documents(reformulated_query)
         
@@ -92,39 +94,49 @@ class ContextualQAChain:
             else:
                 context_texts.append(doc.page_content)
         
-        return "\n\n".join(context_texts)
+        return context_texts
     
-    def generate_answer(self, query: str, history: Optional[List[Dict[str, str]]] = None) -> str:
-        """Generate answer to query using contextual RAG"""
+    def _get_context(self, query: str, history: Optional[List[Dict[str, str]]] = None) -> str:
+        """Get context for query"""
+        return "\n\n".join(self._get_contexts(query, history))
+    
+    def answer_with_contexts(self, query: str, history: Optional[List[Dict[str, str]]] = None) -> Tuple[str, List[str]]:
+        """Generate an answer and return it with the retrieved contexts. Errors are raised."""
         if not history:
             history = []
         
+        # Get context
+        contexts = self._get_contexts(query, history)
+        context = "\n\n".join(contexts)
+        
+        # Format history
+        formatted_history = self._format_history(history)
+        
+        # Create prompt manually
+        prompt_content = f"""
+        You are a helpful assistant that provides accurate information based on the context provided.
+        
+        Answer the question based on the following context and conversation history:
+        
+        Context:
+        {context}
+        
+        Conversation History:
+        {formatted_history}
+        
+        Question: {query}
+        
+        Provide a comprehensive and accurate answer using only the information in the context.
+        """
+        
+        # Call LLM with deadline, hedging and retries
+        response = self.executor.call(self.llm.invoke, prompt_content)
+        return response.content, contexts
+    
+    def generate_answer(self, query: str, history: Optional[List[Dict[str, str]]] = None) -> str:
+        """Generate answer to query using contextual RAG"""
         try:
-            # Get context
-            context = self._get_context(query, history)
-            
-            # Format history
-            formatted_history = self._format_history(history)
-            
-            # Create prompt manually
-            prompt_content = f"""
-            You are a helpful assistant that provides accurate information based on the context provided.
-            
-            Answer the question based on the following context and conversation history:
-            
-            Context:
-            {context}
-            
-            Conversation History:
-            {formatted_history}
-            
-            Question: {query}
-            
-            Provide a comprehensive and accurate answer using only the information in the context.
-            """
-            
-            # Call LLM directly
-            response = self.llm.invoke(prompt_content)
-            return response.content
+            answer, _ = self.answer_with_contexts(query, history)
+            return answer
         except Exception as e:
-            return f"Error generating response: {str(e)}"
\ No newline at end of file
+            return f"Error generating response: {str(e)}"
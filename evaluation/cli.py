@@ -0,0 +1,38 @@
+import argparse
+import os
+from evaluation.modules.runner import EvaluationRunner, load_questions
+
+def add_arguments(parser):
+    """Add the evaluation arguments to a parser"""
+    parser.add_argument('--pdf_path', type=str, required=True, 
+                        help='Path to PDF file or directory containing PDF files')
+    parser.add_argument('--questions', type=str, required=True, 
+                        help='Question file (.json, .jsonl or one question per line)')
+    parser.add_argument('--output_dir', type=str, default='eval_results', 
+                        help='Directory for the cached vector stores, result store and summary')
+    parser.add_argument('--workers', type=int, default=4, 
+                        help='Number of concurrent answering / scoring calls')
+
+def main(args=None):
+    if args is None:
+        parser = argparse.ArgumentParser(description='Evaluate Simple vs Contextual RAG')
+        add_arguments(parser)
+        args = parser.parse_args()
+    
+    # Collect PDF(s)
+    pdf_paths = []
+    if os.path.isdir(args.pdf_path):
+        for file in sorted(os.listdir(args.pdf_path)):
+            if file.endswith('.pdf'):
+                pdf_paths.append(os.path.join(args.pdf_path, file))
+    else:
+        pdf_paths = [args.pdf_path]
+    
+    questions = load_questions(args.questions)
+    print(f"Loaded {len(questions)} question(s) from {args.questions}")
+    
+    runner = EvaluationRunner(pdf_paths, args.output_dir, workers=args.workers)
+    runner.run(questions)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class ResultStore:
+    """SQLite-backed store for evaluation intermediates, so interrupted or extended runs resume.
+
+    Answers and scores are keyed by pipeline, corpus fingerprint and question id, so
+    re-running with extra questions only computes the new ones, while changing the
+    ingested documents or chunking settings starts a fresh set of results. Scores
+    computed against a ground truth answer also record a reference id, so editing
+    the ground truth invalidates them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS ingests (
+                pipeline TEXT NOT NULL,
+                source TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                chunks INTEGER NOT NULL,
+                seconds REAL NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (pipeline, source)
+            );
+            CREATE TABLE IF NOT EXISTS answers (
+                pipeline TEXT NOT NULL,
+                corpus TEXT NOT NULL,
+                question_id TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                contexts TEXT NOT NULL,
+                latency REAL NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (pipeline, corpus, question_id)
+            );
+            CREATE TABLE IF NOT EXISTS scores (
+                pipeline TEXT NOT NULL,
+                corpus TEXT NOT NULL,
+                question_id TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                value REAL,
+                created_at REAL NOT NULL,
+                reference_id TEXT,
+                PRIMARY KEY (pipeline, corpus, question_id, metric)
+            );
+        """)
+        # Stores created before reference ids were recorded
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(scores)")]
+        if "reference_id" not in columns:
+            self._conn.execute("ALTER TABLE scores ADD COLUMN reference_id TEXT")
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Ingestion
+
+    def get_ingest_fingerprint(self, pipeline: str, source: str) -> Optional[str]:
+        """Return the fingerprint of the last completed ingest of a source"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint FROM ingests WHERE pipeline = ? AND source = ?",
+                (pipeline, source)
+            ).fetchone()
+        return row[0] if row else None
+
+    def save_ingest(self, pipeline: str, source: str, fingerprint: str, chunks: int, seconds: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ingests VALUES (?, ?, ?, ?, ?, ?)",
+                (pipeline, source, fingerprint, chunks, seconds, time.time())
+            )
+            self._conn.commit()
+
+    def delete_ingest(self, pipeline: str, source: str):
+        """Forget an ingest so the next run redoes it"""
+        with self._lock:
+            self._conn.execute("DELETE FROM ingests WHERE pipeline = ? AND source = ?", (pipeline, source))
+            self._conn.commit()
+
+    def clear_results(self, pipeline: str, corpus: str):
+        """Drop the answers and scores of a pipeline, e.g. after its index was rebuilt"""
+        with self._lock:
+            self._conn.execute("DELETE FROM answers WHERE pipeline = ? AND corpus = ?", (pipeline, corpus))
+            self._conn.execute("DELETE FROM scores WHERE pipeline = ? AND corpus = ?", (pipeline, corpus))
+            self._conn.commit()
+
+    # Answers
+
+    def get_answers(self, pipeline: str, corpus: str) -> Dict[str, Dict]:
+        """Return stored answers for a pipeline, keyed by question id"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question_id, question, answer, contexts, latency FROM answers "
+                "WHERE pipeline = ? AND corpus = ?",
+                (pipeline, corpus)
+            ).fetchall()
+        return {
+            question_id: {
+                "question": question,
+                "answer": answer,
+                "contexts": json.loads(contexts),
+                "latency": latency,
+            }
+            for question_id, question, answer, contexts, latency in rows
+        }
+
+    def save_answer(self, pipeline: str, corpus: str, question_id: str, question: str,
+                    answer: str, contexts: List[str], latency: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (pipeline, corpus, question_id, question, answer, json.dumps(contexts), latency, time.time())
+            )
+            self._conn.commit()
+
+    # Scores
+
+    def get_scores(self, pipeline: str, corpus: str) -> Dict[str, Dict[str, Tuple[Optional[float], Optional[str]]]]:
+        """Return stored scores for a pipeline as {question_id: {metric: (value, reference_id)}}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question_id, metric, value, reference_id FROM scores WHERE pipeline = ? AND corpus = ?",
+                (pipeline, corpus)
+            ).fetchall()
+        scores: Dict[str, Dict[str, Tuple[Optional[float], Optional[str]]]] = {}
+        for question_id, metric, value, reference_id in rows:
+            scores.setdefault(question_id, {})[metric] = (value, reference_id)
+        return scores
+
+    def save_score(self, pipeline: str, corpus: str, question_id: str, metric: str, value: Optional[float],
+                   reference_id: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (pipeline, corpus, question_id, metric, value, time.time(), reference_id)
+            )
+            self._conn.commit()
@@ -0,0 +1,367 @@
+import asyncio
+import csv
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+from ragas import SingleTurnSample
+from ragas.embeddings import LangchainEmbeddingsWrapper
+from ragas.llms import LangchainLLMWrapper
+from ragas.metrics import (
+    Faithfulness,
+    LLMContextPrecisionWithReference,
+    LLMContextPrecisionWithoutReference,
+    LLMContextRecall,
+    ResponseRelevancy
+)
+from simple_rag.modules.embedding import init_embeddings, init_llm as simple_init_llm
+from simple_rag.modules.pdf_loader import PDFProcessor
+from simple_rag.modules.qa_chain import QAChain
+from contextual_rag.modules.embedding import init_llm as contextual_init_llm
+from contextual_rag.modules.pdf_loader import ContextualPDFProcessor
+from contextual_rag.modules.qa_chain import ContextualQAChain
+from common.llm_executor import get_all_stats, percentile
+from evaluation.modules.result_store import ResultStore
+from config import (
+    CHUNKER, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS,
+    TOKENIZER_ENCODING, SHARD_BY
+)
+
+PIPELINES = ("simple", "contextual")
+METRICS = (
+    "answer_relevancy",
+    "faithfulness",
+    "context_precision_without_reference",
+    "context_precision_with_reference",
+    "context_recall",
+)
+# Metrics that can only be computed for questions with a ground truth answer
+REFERENCE_METRICS = ("context_precision_with_reference", "context_recall")
+
+
+def question_id(question: str) -> str:
+    """Stable id for a question, used as the result store key"""
+    return hashlib.sha1(question.strip().encode("utf-8")).hexdigest()[:16]
+
+
+def reference_id(ground_truth: Optional[str]) -> Optional[str]:
+    """Id of a ground truth answer, stored with the scores computed against it"""
+    if not ground_truth:
+        return None
+    return hashlib.sha1(ground_truth.strip().encode("utf-8")).hexdigest()[:16]
+
+
+def load_questions(path: str) -> List[Dict]:
+    """Load questions from a .json list, a .jsonl file or a text file with one question per line.
+
+    JSON entries may be plain strings or objects with a "question" and an optional
+    "ground_truth" (or "reference") answer, which enables the reference-based metrics.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            entries = json.load(f)
+        elif path.endswith(".jsonl"):
+            entries = [json.loads(line) for line in f if line.strip()]
+        else:
+            entries = [line.strip() for line in f if line.strip()]
+
+    questions = []
+    seen = set()
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"question": entry}
+        question = entry["question"].strip()
+        qid = question_id(question)
+        if qid in seen:
+            continue
+        seen.add(qid)
+        ground_truth = entry.get("ground_truth") or entry.get("reference")
+        questions.append({
+            "id": qid,
+            "question": question,
+            "ground_truth": ground_truth,
+            "reference_id": reference_id(ground_truth),
+        })
+    return questions
+
+
+def mean(values: List[float]) -> Optional[float]:
+    return sum(values) / len(values) if values else None
+
+
+class EvaluationRunner:
+    """Runs Simple and Contextual RAG over a question set and scores both with RAGAS"""
+
+    def __init__(self, pdf_paths: List[str], output_dir: str, workers: int = 4):
+        self.pdf_paths = pdf_paths
+        self.output_dir = output_dir
+        self.workers = workers
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.store = ResultStore(os.path.join(output_dir, "results.sqlite"))
+
+        self.embeddings = init_embeddings()
+        self.llms = {
+            "simple": simple_init_llm(),
+            "contextual": contextual_init_llm(),
+        }
+
+        # Persist the vector stores next to the results so ingestion is cached across runs
+        shard_by = SHARD_BY or "source"
+        self.processors = {
+            "simple": PDFProcessor(
+                self.embeddings,
+                persist_directory=os.path.join(output_dir, "vector_db", "simple"),
+                shard_by=shard_by
+            ),
+            "contextual": ContextualPDFProcessor(
+                self.embeddings,
+                self.llms["contextual"],
+                persist_directory=os.path.join(output_dir, "vector_db", "contextual"),
+                shard_by=shard_by
+            ),
+        }
+        self.chains = {
+            "simple": QAChain(self.processors["simple"].vector_store, self.llms["simple"]),
+            "contextual": ContextualQAChain(self.processors["contextual"].vector_store, self.llms["contextual"]),
+        }
+        self.corpus = None
+        self.incomplete = set()
+
+    # ------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------
+
+    def _fingerprint(self, pdf_path: str) -> str:
+        """Hash of the PDF contents and the chunking settings it was ingested with"""
+        digest = hashlib.sha1()
+        with open(pdf_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        settings = [CHUNKER, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, TOKENIZER_ENCODING]
+        digest.update(json.dumps(settings).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _index(self, pipeline: str, splits: list, pdf_path: str, fingerprint: str):
+        start_time = time.perf_counter()
+        documents, failed = self.processors[pipeline].index_splits(splits, pdf_path)
+        seconds = time.perf_counter() - start_time
+
+        # Answers and scores computed against the previous index are no longer valid
+        self.store.clear_results(pipeline, self.corpus)
+
+        if failed:
+            # Leave the ingest unrecorded so the next run rebuilds it, and skip this
+            # pipeline for now rather than caching results from a degraded index
+            self.store.delete_ingest(pipeline, pdf_path)
+            self.incomplete.add(pipeline)
+            print(f"[{pipeline}] Ingest of {pdf_path} is incomplete: {failed}/{len(documents)} chunks failed. "
+                  f"It will be redone on the next run.")
+            return
+
+        self.store.save_ingest(pipeline, pdf_path, fingerprint, len(documents), seconds)
+        print(f"[{pipeline}] Ingested {pdf_path}: {len(documents)} chunks in {seconds:.1f}s")
+
+    def ingest(self):
+        """Ingest every PDF once, reusing cached vector stores when nothing changed"""
+        fingerprints = {pdf_path: self._fingerprint(pdf_path) for pdf_path in self.pdf_paths}
+        self.corpus = hashlib.sha1("".join(sorted(fingerprints.values())).encode("utf-8")).hexdigest()[:16]
+        self.incomplete = set()
+
+        for pdf_path, fingerprint in fingerprints.items():
+            stale = [
+                pipeline for pipeline in PIPELINES
+                if self.store.get_ingest_fingerprint(pipeline, pdf_path) != fingerprint
+                or not self.processors[pipeline].vector_store.has_source(pdf_path)
+            ]
+            if not stale:
+                print(f"Using cached ingestion for {pdf_path}")
+                continue
+
+            # Load and split once, then index into both pipelines concurrently
+            splits = self.processors["simple"].split_pdf(pdf_path)
+            with ThreadPoolExecutor(max_workers=len(stale)) as executor:
+                futures = [executor.submit(self._index, pipeline, splits, pdf_path, fingerprint) for pipeline in stale]
+                for future in futures:
+                    future.result()
+
+    @property
+    def pipelines(self) -> List[str]:
+        """Pipelines whose ingestion completed and can be answered and scored"""
+        return [pipeline for pipeline in PIPELINES if pipeline not in self.incomplete]
+
+    # ------------------------------------------------------------------
+    # Answering
+    # ------------------------------------------------------------------
+
+    def _answer(self, pipeline: str, question: Dict):
+        start_time = time.perf_counter()
+        answer, contexts = self.chains[pipeline].answer_with_contexts(question["question"])
+        latency = time.perf_counter() - start_time
+        self.store.save_answer(pipeline, self.corpus, question["id"], question["question"], answer, contexts, latency)
+
+    def answer(self, questions: List[Dict]):
+        """Answer every question not already in the result store, across both pipelines"""
+        pending = []
+        for pipeline in self.pipelines:
+            answered = self.store.get_answers(pipeline, self.corpus)
+            pending.extend((pipeline, q) for q in questions if q["id"] not in answered)
+
+        if not pending:
+            print("All answers are cached.")
+            return
+
+        print(f"Answering {len(pending)} question(s)...")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._answer, pipeline, q): (pipeline, q) for pipeline, q in pending}
+            for future in as_completed(futures):
+                pipeline, q = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    # Not stored, so the next run retries it
+                    print(f"[{pipeline}] Error answering {q['question']!r}: {str(e)}")
+
+    # ------------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------------
+
+    def _build_metrics(self) -> Dict:
+        llm = LangchainLLMWrapper(self.llms["simple"])
+        embeddings = LangchainEmbeddingsWrapper(self.embeddings)
+        return {
+            "answer_relevancy": ResponseRelevancy(llm=llm, embeddings=embeddings),
+            "faithfulness": Faithfulness(llm=llm),
+            "context_precision_without_reference": LLMContextPrecisionWithoutReference(llm=llm),
+            "context_precision_with_reference": LLMContextPrecisionWithReference(llm=llm),
+            "context_recall": LLMContextRecall(llm=llm),
+        }
+
+    def _current_scores(self, pipeline: str, questions: List[Dict]) -> Dict[str, Dict[str, Optional[float]]]:
+        """Stored scores of the given questions, without reference metrics computed
+        against a ground truth that has since changed"""
+        stored = self.store.get_scores(pipeline, self.corpus)
+        scores = {}
+        for q in questions:
+            scores[q["id"]] = {
+                metric: value
+                for metric, (value, ref_id) in stored.get(q["id"], {}).items()
+                if metric not in REFERENCE_METRICS or ref_id == q["reference_id"]
+            }
+        return scores
+
+    def _pending_scores(self, questions: List[Dict]) -> List:
+        pending = []
+        for pipeline in self.pipelines:
+            answers = self.store.get_answers(pipeline, self.corpus)
+            scores = self._current_scores(pipeline, questions)
+            for q in questions:
+                if q["id"] not in answers:
+                    continue
+                for metric in METRICS:
+                    if metric in REFERENCE_METRICS and not q["ground_truth"]:
+                        continue
+                    if metric not in scores[q["id"]]:
+                        pending.append((pipeline, q, answers[q["id"]], metric))
+        return pending
+
+    async def _score_all(self, pending: List):
+        metrics = self._build_metrics()
+        semaphore = asyncio.Semaphore(self.workers)
+
+        async def score(pipeline, q, answer, metric):
+            sample = SingleTurnSample(
+                user_input=q["question"],
+                response=answer["answer"],
+                retrieved_contexts=answer["contexts"],
+                reference=q["ground_truth"]
+            )
+            async with semaphore:
+                try:
+                    value = await metrics[metric].single_turn_ascore(sample)
+                except Exception as e:
+                    # Not stored, so the next run retries it
+                    print(f"[{pipeline}] Error computing {metric} for {q['question']!r}: {str(e)}")
+                    return
+
+            value = None if value is None or math.isnan(value) else float(value)
+            ref_id = q["reference_id"] if metric in REFERENCE_METRICS else None
+            self.store.save_score(pipeline, self.corpus, q["id"], metric, value, reference_id=ref_id)
+
+        await asyncio.gather(*(score(*item) for item in pending))
+
+    def score(self, questions: List[Dict]):
+        """Compute every RAGAS score not already in the result store"""
+        pending = self._pending_scores(questions)
+        if not pending:
+            print("All scores are cached.")
+            return
+
+        print(f"Computing {len(pending)} score(s)...")
+        asyncio.run(self._score_all(pending))
+
+    # ------------------------------------------------------------------
+    # Summary
+    # ------------------------------------------------------------------
+
+    def summarize(self, questions: List[Dict]) -> Dict:
+        """Aggregate quality and latency per pipeline and write summary.json / summary.csv"""
+        question_ids = {q["id"] for q in questions}
+        summary = {"corpus": self.corpus, "questions": len(questions), "pipelines": {}}
+
+        for pipeline in PIPELINES:
+            answers = {qid: a for qid, a in self.store.get_answers(pipeline, self.corpus).items() if qid in question_ids}
+            scores = {qid: s for qid, s in self._current_scores(pipeline, questions).items() if qid in answers}
+            latencies = [a["latency"] for a in answers.values()]
+
+            result = {"answered": len(answers), "ingest_complete": pipeline not in self.incomplete}
+            for metric in METRICS:
+                values = [s[metric] for s in scores.values() if s.get(metric) is not None]
+                result[metric] = mean(values)
+            result["latency_mean_s"] = mean(latencies)
+            result["latency_p50_s"] = percentile(latencies, 50)
+            result["latency_p95_s"] = percentile(latencies, 95)
+            summary["pipelines"][pipeline] = result
+
+        # Executor counters and tail latencies for the LLM calls made in this run
+        summary["llm_calls"] = get_all_stats()
+
+        with open(os.path.join(self.output_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+        rows = ["ingest_complete", "answered", *METRICS, "latency_mean_s", "latency_p50_s", "latency_p95_s"]
+        with open(os.path.join(self.output_dir, "summary.csv"), "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["metric", *PIPELINES])
+            for row in rows:
+                writer.writerow([row, *(summary["pipelines"][p][row] for p in PIPELINES)])
+
+        def fmt(value):
+            if value is None:
+                return "n/a"
+            return f"{value:.3f}" if isinstance(value, float) else str(value)
+
+        print(f"\n{'metric':<36} {'simple':>12} {'contextual':>12}")
+        for row in rows:
+            print(f"{row:<36} {fmt(summary['pipelines']['simple'][row]):>12} "
+                  f"{fmt(summary['pipelines']['contextual'][row]):>12}")
+        for name, stats in summary["llm_calls"].items():
+            print(f"\nLLM calls [{name}]: {stats['calls']} calls, {stats['retries']} retries, "
+                  f"{stats['hedges']} hedges ({stats['hedge_wins']} won), {stats['timeouts']} timeouts, "
+                  f"p50 {fmt(stats['latency_p50_s'])}s, p99 {fmt(stats['latency_p99_s'])}s, "
+                  f"circuit {stats['circuit_state']}")
+        print(f"\nResults written to {self.output_dir}")
+
+        return summary
+
+    def run(self, questions: List[Dict]) -> Dict:
+        try:
+            self.ingest()
+            self.answer(questions)
+            self.score(questions)
+            return self.summarize(questions)
+        finally:
+            self.store.close()
@@ -1,24 +1,46 @@
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
-from typing import List
+from typing import List, Tuple
 from langchain_core.documents import Document
-from config import CHUNK_SIZE, CHUNK_OVERLAP
+from common.chunker import ChunkView, OffsetChunker
+from common.sharded_store import ShardedVectorStore
+from config import CHUNK_SIZE, CHUNK_OVERLAP, CHUNKER, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, TOKENIZER_ENCODING, SHARD_BY, NUM_SHARDS, MAX_LOADED_SHARDS, SHARD_SEARCH_WORKERS
 
 class PDFProcessor:
-    def __init__(self, embeddings, persist_directory=None):
+    def __init__(self, embeddings, persist_directory=None, shard_by=SHARD_BY, chunker=CHUNKER):
         """Initialize PDF processor with text splitter and vector store"""
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP
-        )
-        self.vector_store = Chroma(
-            embedding_function=embeddings,
-            persist_directory=persist_directory
-        )
+        if chunker == "offset":
+            self.text_splitter = OffsetChunker(
+                chunk_size=CHUNK_TOKENS,
+                chunk_overlap=CHUNK_OVERLAP_TOKENS,
+                encoding_name=TOKENIZER_ENCODING
+            )
+        elif chunker == "recursive":
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=CHUNK_SIZE,
+                chunk_overlap=CHUNK_OVERLAP
+            )
+        else:
+            raise ValueError(f"Unknown chunker: {chunker!r} (expected 'recursive' or 'offset')")
+        if shard_by:
+            self.vector_store = ShardedVectorStore(
+                embeddings,
+                persist_directory=persist_directory,
+                namespace="simple",
+                shard_by=shard_by,
+                num_shards=NUM_SHARDS,
+                max_loaded_shards=MAX_LOADED_SHARDS,
+                max_workers=SHARD_SEARCH_WORKERS
+            )
+        else:
+            self.vector_store = Chroma(
+                embedding_function=embeddings,
+                persist_directory=persist_directory
+            )
     
-    def load_and_process(self, pdf_path: str) -> List[Document]:
-        """Load and process a PDF document"""
+    def split_pdf(self, pdf_path: str) -> list:
+        """Load a PDF and split it into chunks (documents or offset chunk views)"""
         # Load PDF
         loader = PyPDFLoader(pdf_path)
         documents = loader.load()
@@ -29,9 +51,24 @@ class PDFProcessor:
                 doc.metadata["source"] = pdf_path
         
         # Split text
-        splits = self.text_splitter.split_documents(documents)
+        if isinstance(self.text_splitter, OffsetChunker):
+            return self.text_splitter.split_documents(documents, source=pdf_path)
+        return self.text_splitter.split_documents(documents)
+    
+    def index_splits(self, splits: list, pdf_path: str) -> Tuple[List[Document], int]:
+        """Add the chunks of a PDF to the vector store. Returns the documents and the number of failed chunks."""
+        splits = [chunk.to_document() if isinstance(chunk, ChunkView) else chunk for chunk in splits]
+        
+        # Drop any chunks from a previous ingest of this PDF so it is rebuilt in place
+        if isinstance(self.vector_store, ShardedVectorStore):
+            self.vector_store.delete_source(pdf_path)
         
         # Add to vector store
         self.vector_store.add_documents(documents=splits)
         
-        return splits
\ No newline at end of file
+        return splits, 0
+    
+    def load_and_process(self, pdf_path: str) -> List[Document]:
+        """Load and process a PDF document"""
+        documents, _ = self.index_splits(self.split_pdf(pdf_path), pdf_path)
+        return documents
@@ -2,13 +2,16 @@ from langchain_chroma import Chroma
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from typing import List, Tuple
+from common.llm_executor import get_executor
 
 class QAChain:
     """Question-answering chain for Simple RAG"""
     
-    def __init__(self, vector_store: Chroma, llm):
+    def __init__(self, vector_store: Chroma, llm, executor=None):
         self.vector_store = vector_store
         self.llm = llm
+        self.executor = executor or get_executor("query")
         self.retriever = vector_store.as_retriever(search_kwargs={"k": 3})
         
         # Setup RAG prompt
@@ -30,26 +33,32 @@ class QAChain:
             | StrOutputParser()
         )
     
+    def answer_with_contexts(self, query: str) -> Tuple[str, List[str]]:
+        """Generate an answer and return it with the retrieved contexts. Errors are raised."""
+        # Get relevant documents directly
+        docs = self.retriever.get_relevant_documents(query)
+        contexts = [doc.page_content for doc in docs]
+        context = "\n\n".join(contexts)
+        
+        # Format the prompt manually
+        prompt_content = f"""
+        You are a helpful assistant that provides accurate information based on the context provided.
+        
+        Answer the question based only on the following context:
+        
+        {context}
+        
+        Question: {query}
+        """
+        
+        # Call LLM with deadline, hedging and retries
+        response = self.executor.call(self.llm.invoke, prompt_content)
+        return response.content, contexts
+    
     def generate_answer(self, query: str) -> str:
         """Generate an answer for the query using RAG"""
         try:
-            # Get relevant documents directly
-            docs = self.retriever.get_relevant_documents(query)
-            context = "\n\n".join([doc.page_content for doc in docs])
-            
-            # Format the prompt manually
-            prompt_content = f"""
-            You are a helpful assistant that provides accurate information based on the context provided.
-            
-            Answer the question based only on the following context:
-            
-            {context}
-            
-            Question: {query}
-            """
-            
-            # Call LLM directly
-            response = self.llm.invoke(prompt_content)
-            return response.content
+            answer, _ = self.answer_with_contexts(query)
+            return answer
         except Exception as e:
-            return f"Error generating response: {str(e)}"
\ No newline at end of file
+            return f"Error generating response: {str(e)}"